@@ -1,16 +1,18 @@
 """Core ripping functionality"""
 
 import base64
+import bisect
 import csv
 import concurrent.futures
 import dataclasses
 import io
 import json
 import logging
+import operator
 import os
 import pathlib
 import threading
-from typing import Callable, Dict, Iterable, List, Optional, Sequence, TextIO
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, TextIO, Tuple
 
 import fsb5  # type: ignore
 import mutagen.oggvorbis
@@ -28,6 +30,7 @@ CATALOG_BUNDLE_PREFIX = "{UnityEngine.AddressableAssets.Addressables.RuntimePath
 
 # Remove these characters before writing filename
 ILLEGAL_FILENAME_CHARS = '<>:"/\\|?*'
+ILLEGAL_FILENAME_TABLE = str.maketrans(dict.fromkeys(ILLEGAL_FILENAME_CHARS, "_"))
 
 # default to Steam install location
 DEFAULT_GAME_DIR = pathlib.Path(
@@ -50,6 +53,10 @@ LANGUAGES: Dict[Optional[str], Optional[str]] = {
 # this is rough and for the progress bar only. Depends on number of cores and such
 CONFIG_PARSE_PROGRESS: float = 10
 
+# game_dir and catalog_list of a worker process, see init_worker()
+WORKER_GAME_DIR: Optional[pathlib.Path] = None
+WORKER_CATALOG: List[str] = []
+
 
 class UserError(Exception):
     """Exception for when the program was used incorrectly by the user"""
@@ -59,7 +66,7 @@ class UserError(Exception):
         self.message = message
 
 
-@dataclasses.dataclass
+@dataclasses.dataclass(slots=True)
 class Song:
     """Dataclass to store song metadata"""
 
@@ -108,40 +115,62 @@ def normalize_songs(songs: List[Song]) -> None:
         song.genre = "Video Games"
 
 
+def peek_name(obj: UnityPy.files.ObjectReader) -> str:
+    """Read the name of a NamedObject without deserializing the rest of it"""
+    # m_Name is the first field of a NamedObject, see UnityPy.classes.NamedObject
+    obj.reset()
+    return obj.reader.read_aligned_string()
+
+
 def find_asset(
     env: UnityPy.Environment, object_type: str, name: str, raise_on_not_found: bool = True
 ) -> UnityPy.classes.NamedObject:
     """Find a specific asset in a bundle"""
     for obj in env.objects:
-        if obj.type.name != object_type:
-            continue
-        data = obj.read()
-        if data.name == name:
-            return data
+        # only fully read the object we are looking for, read() can be expensive (e.g. Texture2D)
+        if obj.type.name == object_type and peek_name(obj) == name:
+            return obj.read()
     if raise_on_not_found:
         raise FileNotFoundError(f"Could not find asset '{name}'")
     return None
 
 
+def decode_json(text: str) -> Any:
+    """Parse JSON, falling back to JSON5 if it is not strictly valid JSON"""
+    try:
+        # the stdlib parser is faster than pyjson5, and most assets are plain JSON
+        return json.loads(text)
+    except json.JSONDecodeError:
+        # We use JSON5 parsing because the albums JSON assets have trailing commas
+        # pylint can't see inside pyjson5
+        return pyjson5.decode(text)  # pylint: disable=no-member
+
+
 def load_catalog(game_dir: pathlib.Path) -> List[str]:
-    """Parse the Addressables catalog.json to get a list of all bundles"""
+    """Parse the Addressables catalog.json to get a sorted list of all bundles"""
     catalog_path = game_dir / ADDRESSABLES_DIR / "catalog.json"
-    with open(catalog_path, "rb") as catalog_file:
-        # mypy decides that decode() does not take a file, pylint can't see inside pyjson5
-        internal_ids = pyjson5.decode_io(catalog_file)["m_InternalIds"]  # type: ignore[arg-type] # pylint: disable=no-member
+    # utf-8-sig in case the catalog starts with a byte order mark, which json rejects
+    catalog_text = catalog_path.read_text(encoding="utf-8-sig")
+    internal_ids = decode_json(catalog_text)["m_InternalIds"]
 
     if DEBUG:
         with pathlib.Path("internal_ids.json").open("wt", encoding="utf-8") as json_file:
             json.dump(internal_ids, json_file, indent=4)
 
     filtered = filter(lambda s: s.startswith(CATALOG_BUNDLE_PREFIX), internal_ids)
-    return list(map(lambda s: s[len(CATALOG_BUNDLE_PREFIX) :], filtered))
+    # sorted so that find_with_prefix() can binary search
+    return sorted(map(lambda s: s[len(CATALOG_BUNDLE_PREFIX) :], filtered))
 
 
 def find_with_prefix(game_dir: pathlib.Path, catalog_list: List[str], prefix: str) -> pathlib.Path:
-    """Find a file with a prefix in a folder"""
+    """Find a file with a prefix in the sorted catalog list"""
     addressables_path = game_dir / ADDRESSABLES_DIR
-    filtered = list(filter(lambda s: s.startswith("StandaloneWindows64\\" + prefix), catalog_list))
+    full_prefix = "StandaloneWindows64\\" + prefix
+    # all entries with the prefix are contiguous, starting at the insertion point
+    start = end = bisect.bisect_left(catalog_list, full_prefix)
+    while end < len(catalog_list) and catalog_list[end].startswith(full_prefix):
+        end += 1
+    filtered = catalog_list[start:end]
     if len(filtered) != 1:
         raise FileNotFoundError(f"Could not find unique bundle file with prefix '{prefix}'")
     full_path = addressables_path / filtered[0]
@@ -155,9 +184,17 @@ def load_json(bundle_path: pathlib.Path, asset_name: str) -> List:
     with bundle_path.open("rb") as bundle_file:
         env = UnityPy.load(bundle_file)
         data = find_asset(env, "TextAsset", asset_name)
-        # We use JSON5 parsing because the albums JSON assets have trailing commas
-        # pylint can't see inside pyjson5
-        return pyjson5.decode(data.text)  # pylint: disable=no-member
+        return decode_json(data.text)
+
+
+def init_worker(game_dir: pathlib.Path, catalog_list: List[str]) -> None:
+    """Initializer for worker processes
+
+    Stores the game folder and catalog in each worker once, instead of pickling them into every task
+    """
+    global WORKER_GAME_DIR, WORKER_CATALOG  # pylint: disable=global-statement
+    WORKER_GAME_DIR = game_dir
+    WORKER_CATALOG = catalog_list
 
 
 def parallel_execute(
@@ -169,37 +206,73 @@ def parallel_execute(
     done_callback: Callable,
 ) -> bool:
     """Use a ProcessPoolExecutor to run func in parallel with error handling"""
-    not_done = set()
-    for item in iterable:
-        not_done.add(executor.submit(func, *args, item))
+    futures = [executor.submit(func, *args, item) for item in iterable]
     error = None
     all_done = True
-    while not_done:
-        done, not_done = concurrent.futures.wait(
-            not_done, return_when=concurrent.futures.FIRST_COMPLETED
-        )
-        for future in done:
-            try:
-                done_callback(future.result())
-            except concurrent.futures.CancelledError:
-                all_done = False
-            except Exception as err:  # pylint: disable=broad-except
-                error = err
-        if stop_event.is_set() or error:
-            for future in not_done:
-                future.cancel()
+    cancelling = False
+    # cancelled futures are also yielded by as_completed(), so this still drains every future
+    for future in concurrent.futures.as_completed(futures):
+        try:
+            done_callback(future.result())
+        except concurrent.futures.CancelledError:
+            all_done = False
+        except Exception as err:  # pylint: disable=broad-except
+            error = err
+        if (stop_event.is_set() or error) and not cancelling:
+            # cancel once, later futures are only drained
+            cancelling = True
+            for pending in futures:
+                pending.cancel()
     if error:
         raise error
     return all_done
 
 
+def load_album_jsons(l_suffix: Optional[str], json_name: str) -> Tuple[str, List, List]:
+    """Load the general and language-specific JSONs of a single album, in a worker process"""
+    assert WORKER_GAME_DIR is not None, "init_worker() has not run"
+    game_dir, catalog_list = WORKER_GAME_DIR, WORKER_CATALOG
+    json_name_lower = json_name.lower()
+    # load individual album JSON
+    prefix = f"config_others_assets_{json_name_lower}_"
+    entry_path = find_with_prefix(game_dir, catalog_list, prefix)
+    entry_json = load_json(entry_path, json_name)
+    if DEBUG:
+        folder = pathlib.Path("album_jsons")
+        folder.mkdir(exist_ok=True)
+        file_name = json_name_lower + ".json"
+        with (folder / file_name).open("wt", encoding="utf-8") as json_file:
+            json.dump(entry_json, json_file, indent=4)
+
+    # load the language-specific individual album JSON
+    if l_suffix is not None:
+        l_suffix_lower = l_suffix.lower()
+        prefix = f"config_{l_suffix_lower}_assets_{json_name_lower}_{l_suffix_lower}_"
+        l_entry_path = find_with_prefix(game_dir, catalog_list, prefix)
+        l_entry_json = load_json(l_entry_path, json_name + "_" + l_suffix)
+        if DEBUG:
+            file_name = json_name_lower + "_l.json"
+            with (pathlib.Path("album_jsons") / file_name).open(
+                "wt", encoding="utf-8"
+            ) as json_file:
+                json.dump(l_entry_json, json_file, indent=4)
+    else:
+        l_entry_json = [{}] * len(entry_json)
+    return json_name, entry_json, l_entry_json
+
+
 def parse_config(
+    executor: concurrent.futures.ProcessPoolExecutor,
+    stop_event: threading.Event,
     game_dir: pathlib.Path,
     catalog_list: List[str],
     language: Optional[str],
     progress: Callable[[float], None],
 ) -> List[Song]:
-    """Parse the game configuration JSONs to create a list of Songs"""
+    """Parse the game configuration JSONs to create a list of Songs
+
+    Returns an empty list if stop_event was set before all albums were loaded.
+    """
     l_suffix = LANGUAGES.get(language)
     # load the "albums" JSON containing info on all albums
     albums_path = find_with_prefix(game_dir, catalog_list, "config_others_assets_albums_")
@@ -210,7 +283,8 @@ def parse_config(
 
     # load the language-specific albums JSON
     if l_suffix is not None:
-        prefix = "config_" + l_suffix.lower() + "_assets_albums_" + l_suffix.lower() + "_"
+        l_suffix_lower = l_suffix.lower()
+        prefix = f"config_{l_suffix_lower}_assets_albums_{l_suffix_lower}_"
         l_albums_path = find_with_prefix(game_dir, catalog_list, prefix)
         l_albums_json = load_json(l_albums_path, "albums_" + l_suffix)
         if DEBUG:
@@ -220,52 +294,44 @@ def parse_config(
     else:
         l_albums_json = [{}] * len(albums_json)
 
-    # iterate through the albums
-    songs = []
-    for album_num, (album_entry, l_album_entry) in enumerate(zip(albums_json, l_albums_json), 1):
+    albums = []
+    for album_entry, l_album_entry in zip(albums_json, l_albums_json):
         # overlay language-specific stuff onto general album entry
         album_entry.update(l_album_entry)
 
-        if not album_entry["jsonName"]:
-            # Just as Planned is listed as an album without a jsonName
-            continue
+        # Just as Planned is listed as an album without a jsonName
+        if album_entry["jsonName"]:
+            albums.append(album_entry)
 
-        # load individual album JSON
-        prefix = "config_others_assets_" + album_entry["jsonName"].lower() + "_"
-        entry_path = find_with_prefix(game_dir, catalog_list, prefix)
-        entry_json = load_json(entry_path, album_entry["jsonName"])
-        if DEBUG:
-            folder = pathlib.Path("album_jsons")
-            folder.mkdir(exist_ok=True)
-            file_name = album_entry["jsonName"].lower() + ".json"
-            with (folder / file_name).open("wt", encoding="utf-8") as json_file:
-                json.dump(entry_json, json_file, indent=4)
-
-        # load the language-specific individual album JSON
-        if l_suffix is not None:
-            prefix = (
-                "config_"
-                + l_suffix.lower()
-                + "_assets_"
-                + album_entry["jsonName"].lower()
-                + "_"
-                + l_suffix.lower()
-                + "_"
-            )
-            l_entry_path = find_with_prefix(game_dir, catalog_list, prefix)
-            l_entry_json = load_json(l_entry_path, album_entry["jsonName"] + "_" + l_suffix)
-            if DEBUG:
-                file_name = album_entry["jsonName"].lower() + "_l.json"
-                with (pathlib.Path("album_jsons") / file_name).open(
-                    "wt", encoding="utf-8"
-                ) as json_file:
-                    json.dump(l_entry_json, json_file, indent=4)
-
-            if len(entry_json) != len(l_entry_json):
-                logger.warning("%s has differing length JSONs", album_entry["jsonName"])
-        else:
-            l_entry_json = [{}] * len(entry_json)
+    album_jsons: Dict[str, Tuple[List, List]] = {}
+
+    def album_loaded(result: Tuple[str, List, List]) -> None:
+        """Callback for parallel loading of album JSONs"""
+        json_name, entry_json, l_entry_json = result
+        album_jsons[json_name] = (entry_json, l_entry_json)
+        progress(len(album_jsons) / len(albums) * 100)
+
+    if not parallel_execute(
+        executor,
+        stop_event,
+        load_album_jsons,
+        (l_suffix,),
+        (album_entry["jsonName"] for album_entry in albums),
+        album_loaded,
+    ):
+        return []
 
+    # iterate through the albums
+    songs = []
+    for album_entry in albums:
+        entry_json, l_entry_json = album_jsons[album_entry["jsonName"]]
+        # logged here rather than in load_album_jsons(), worker process logs are not shown
+        if len(entry_json) != len(l_entry_json):
+            logger.warning("%s has differing length JSONs", album_entry["jsonName"])
+        # album-level fields are the same for every track
+        album_number = int(album_entry["jsonName"].removeprefix("ALBUM"))
+        album_name = album_entry["title"]
+        track_total = len(entry_json)
         for track_num, (song_entry, l_song_entry) in enumerate(
             zip(entry_json, l_entry_json), start=1
         ):
@@ -274,24 +340,22 @@ def parse_config(
 
             # construct Song from song and album entries
             # asset_name reconstructed from cover_name
-            assert song_entry["cover"].endswith("_cover")
-            asset_name = song_entry["cover"][: -len("_cover")]
+            asset_name = song_entry["cover"].removesuffix("_cover")
+            assert asset_name != song_entry["cover"]
             songs.append(
                 Song(
                     title=song_entry["name"],
                     artist=song_entry["author"],
-                    album_number=int(album_entry["jsonName"].lstrip("ALBUM")),
-                    album_name=album_entry["title"],
+                    album_number=album_number,
+                    album_name=album_name,
                     track_number=track_num,
-                    track_total=len(entry_json),
+                    track_total=track_total,
                     music_asset_name=asset_name,
                     song_asset_name=asset_name,
                     music_name=song_entry["music"],
                     cover_name=song_entry["cover"],
                 )
             )
-
-        progress(album_num / len(albums_json) * 100)
     return sorted(songs, key=lambda song: (song.album_number, song.track_number))
 
 
@@ -307,7 +371,8 @@ def extract_music(game_dir: pathlib.Path, catalog_list: List[str], song: Song) -
         fsb = fsb5.FSB5(data.m_AudioData)
         # there should only be one track
         assert len(fsb.samples) == 1
-        return io.BytesIO(fsb.rebuild_sample(fsb.samples[0]).tobytes())
+        # BytesIO copies straight from the rebuilt memoryview, no need for tobytes()
+        return io.BytesIO(fsb.rebuild_sample(fsb.samples[0]))
 
 
 def extract_cover(game_dir: pathlib.Path, catalog_list: List[str], song: Song) -> PIL.Image.Image:
@@ -319,8 +384,8 @@ def extract_cover(game_dir: pathlib.Path, catalog_list: List[str], song: Song) -
         return find_asset(env, "Texture2D", song.cover_name).image
 
 
-def embed_metadata(music_file: io.BytesIO, cover_image: PIL.Image.Image, song: Song) -> None:
-    """Add metadata to extracted OGG files.
+def embed_metadata(music_file: io.BytesIO, cover_image: PIL.Image.Image, song: Song) -> bytes:
+    """Add metadata to extracted OGG files, returning the cover image encoded as PNG.
 
     For details on the METADATA_BLOCK_PICTURE struct format, see
     https://xiph.org/flac/format.html#metadata_block_picture
@@ -338,7 +403,8 @@ def embed_metadata(music_file: io.BytesIO, cover_image: PIL.Image.Image, song: S
 
     # PIL does not allow for direct saving to bytes
     cover_image_file = io.BytesIO()
-    cover_image.save(cover_image_file, format="png")
+    # zlib level 1 encodes several times faster than the default of 6 for a slightly bigger file
+    cover_image.save(cover_image_file, format="png", compress_level=1)
     picture.data = cover_image_file.getvalue()
 
     picture.type = 3  # Cover (front)
@@ -352,13 +418,12 @@ def embed_metadata(music_file: io.BytesIO, cover_image: PIL.Image.Image, song: S
 
     audio["metadata_block_picture"] = [base64.b64encode(picture.write()).decode("ascii")]
     audio.save(music_file)
+    return picture.data
 
 
 def normalize_path_segment(segment: str) -> str:
     """Remove illegal characters from a path"""
-    for char in ILLEGAL_FILENAME_CHARS:
-        segment = segment.replace(char, "_")
-    return segment
+    return segment.translate(ILLEGAL_FILENAME_TABLE)
 
 
 def songs_to_csv(songs: List[Song], csv_file: TextIO) -> None:
@@ -367,43 +432,58 @@ def songs_to_csv(songs: List[Song], csv_file: TextIO) -> None:
     csv_file.write("\ufeff")
     # don't include empty genre in CSV file
     field_names = [field.name for field in dataclasses.fields(Song) if field.name != "genre"]
-    writer = csv.DictWriter(csv_file, field_names)
-    writer.writeheader()
-    for song in songs:
-        row = dataclasses.asdict(song)
-        row.pop("genre")
-        writer.writerow(row)
+    writer = csv.writer(csv_file)
+    writer.writerow(field_names)
+    # plain attribute access, dataclasses.asdict() deep-copies every Song
+    writer.writerows(map(operator.attrgetter(*field_names), songs))
+
+
+def make_output_dirs(
+    songs: List[Song], output_dir: pathlib.Path, album_dirs: bool, save_covers: bool
+) -> None:
+    """Create all output folders up front, so the parallel workers don't have to"""
+    if save_covers:
+        (output_dir / "covers").mkdir(parents=True, exist_ok=True)
+    if not album_dirs:
+        return
+    for album_dirname in set(normalize_path_segment(song.album_name) for song in songs):
+        (output_dir / album_dirname).mkdir(parents=True, exist_ok=True)
+        if save_covers:
+            (output_dir / "covers" / album_dirname).mkdir(parents=True, exist_ok=True)
 
 
 def export_song(
-    game_dir: pathlib.Path,
-    catalog_list: List[str],
     output_dir: pathlib.Path,
     album_dirs: bool,
     save_covers: bool,
     song: Song,
 ):
-    """Rip a single song"""
+    """Rip a single song, in a worker process
+
+    Output folders must already exist, see make_output_dirs()
+    """
+    assert WORKER_GAME_DIR is not None, "init_worker() has not run"
+    game_dir, catalog_list = WORKER_GAME_DIR, WORKER_CATALOG
     album_dirname = normalize_path_segment(song.album_name)
     song_filestem = normalize_path_segment(song.title)
     music = extract_music(game_dir, catalog_list, song)
     cover = extract_cover(game_dir, catalog_list, song)
-    embed_metadata(music, cover, song)
+    cover_png = embed_metadata(music, cover, song)
     if album_dirs:
-        (output_dir / album_dirname).mkdir(parents=True, exist_ok=True)
         music_filename = output_dir / album_dirname / (song_filestem + ".ogg")
     else:
         music_filename = output_dir / (song_filestem + ".ogg")
     with music_filename.open("wb") as music_file:
-        music_file.write(music.getvalue())
+        # getbuffer() avoids copying the whole file like getvalue() would
+        music_file.write(music.getbuffer())
     if save_covers:
         if album_dirs:
-            (output_dir / "covers" / album_dirname).mkdir(parents=True, exist_ok=True)
             cover_filename = output_dir / "covers" / album_dirname / (song_filestem + ".png")
         else:
             cover_filename = output_dir / "covers" / (song_filestem + ".png")
         with cover_filename.open("wb") as cover_file:
-            cover.save(cover_file, format="png")
+            # reuse the PNG we already encoded for the metadata
+            cover_file.write(cover_png)
     return f"Exported song: {song.title} by {song.artist}"
 
 
@@ -436,38 +516,47 @@ def rip(
     output_dir.mkdir(parents=True, exist_ok=True)
     logger.info("Parsing game config...")
     catalog = load_catalog(game_dir)
-    songs = parse_config(
-        game_dir, catalog, language, progress=lambda x: progress(x * CONFIG_PARSE_PROGRESS / 100)
-    )
-    fix_songs(songs)
-    if save_songs_csv:
-        logger.info("Saving songs.csv...")
-        with (output_dir / "songs.csv").open("wt", encoding="utf-8", newline="") as csv_file:
-            songs_to_csv(songs, csv_file)
-    normalize_songs(songs)
-    if save_covers:
-        (output_dir / "covers").mkdir(parents=True, exist_ok=True)
-    num_albums = len(set(song.album_number for song in songs))
-    logger.info("%s songs in %s albums found.", len(songs), num_albums)
-    if stop_event.is_set():
-        return False
-
-    done_counter = 0
-
-    def log_exported(message: str) -> None:
-        """Callback for parallel exporting of songs"""
-        nonlocal done_counter
-        done_counter += 1
-        progress(CONFIG_PARSE_PROGRESS + (100 - CONFIG_PARSE_PROGRESS) * done_counter / len(songs))
-        logger.info(message)
-
-    logger.info("Exporting songs...")
-    with concurrent.futures.ProcessPoolExecutor() as executor:
+    # the same worker processes are used for config parsing and for exporting
+    with concurrent.futures.ProcessPoolExecutor(
+        initializer=init_worker, initargs=(game_dir, catalog)
+    ) as executor:
+        songs = parse_config(
+            executor,
+            stop_event,
+            game_dir,
+            catalog,
+            language,
+            progress=lambda x: progress(x * CONFIG_PARSE_PROGRESS / 100),
+        )
+        if stop_event.is_set():
+            return False
+        fix_songs(songs)
+        if save_songs_csv:
+            logger.info("Saving songs.csv...")
+            with (output_dir / "songs.csv").open("wt", encoding="utf-8", newline="") as csv_file:
+                songs_to_csv(songs, csv_file)
+        normalize_songs(songs)
+        make_output_dirs(songs, output_dir, album_dirs, save_covers)
+        num_albums = len(set(song.album_number for song in songs))
+        logger.info("%s songs in %s albums found.", len(songs), num_albums)
+
+        done_counter = 0
+
+        def log_exported(message: str) -> None:
+            """Callback for parallel exporting of songs"""
+            nonlocal done_counter
+            done_counter += 1
+            progress(
+                CONFIG_PARSE_PROGRESS + (100 - CONFIG_PARSE_PROGRESS) * done_counter / len(songs)
+            )
+            logger.info(message)
+
+        logger.info("Exporting songs...")
         if not parallel_execute(
             executor,
             stop_event,
             export_song,
-            (game_dir, catalog, output_dir, album_dirs, save_covers),
+            (output_dir, album_dirs, save_covers),
             songs,
             log_exported,
         ):
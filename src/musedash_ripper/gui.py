@@ -1,7 +1,9 @@
 """Tkinter-based GUI"""
 
 import logging
+import logging.handlers
 import multiprocessing
+import os
 import pathlib
 import queue
 import threading
@@ -16,6 +18,11 @@ from musedash_ripper import core
 
 logger = logging.getLogger(__name__)
 
+# how often queued log messages and progress from the rip thread are shown, in milliseconds
+FLUSH_INTERVAL = 50
+# oldest lines are dropped beyond this, a full rip logs a few hundred lines
+LOG_MAX_LINES = 5000
+
 
 # we cannot control how many ancestors are in the tkinter library
 class Application(ttk.Frame):  # pylint: disable=too-many-ancestors
@@ -36,7 +43,11 @@ class Application(ttk.Frame):  # pylint: disable=too-many-ancestors
 
         self.log_empty = True
         self.log_queue = queue.SimpleQueue()
-        self.bind("<<emit_log>>", self.emit_log)
+        self.after(FLUSH_INTERVAL, self.flush_log)
+
+        # written by the rip thread, shown on the main thread by flush_log()
+        self.progress = 0.0
+        self.shown_progress = 0.0
 
     def create_widgets(self):
         """Create all widgets in the main window"""
@@ -132,19 +143,26 @@ class Application(ttk.Frame):  # pylint: disable=too-many-ancestors
         )
         if gamedir:
             self.gd_entry.delete(0, "end")
-            self.gd_entry.insert(0, gamedir.replace("/", "\\"))
+            self.gd_entry.insert(0, os.path.normpath(gamedir))
 
     def set_outdir(self):
         """Open a file dialog to browse to an output directory"""
         outdir = filedialog.askdirectory(parent=self, initialdir=self.od_entry.get())
         if outdir:
             self.od_entry.delete(0, "end")
-            self.od_entry.insert(0, outdir.replace("/", "\\"))
+            self.od_entry.insert(0, os.path.normpath(outdir))
 
     def copy_log(self, _event=None):
-        """Copy the entire log to clipboard"""
+        """Copy the selection, or the entire log if nothing is selected, to clipboard"""
+        try:
+            text = self.log.get("sel.first", "sel.last")
+        except tk.TclError:
+            # there is no selection
+            text = self.log.get("1.0", "end-1c")
         self.clipboard_clear()
-        self.clipboard_append(self.log.get("sel.first", "sel.last"))
+        self.clipboard_append(text)
+        # don't let the default Text binding copy a second time
+        return "break"
 
     def start_rip(self):
         """Start the ripping process on another thread"""
@@ -174,7 +192,7 @@ class Application(ttk.Frame):  # pylint: disable=too-many-ancestors
                 self.ad_var.get(),
                 self.sc_var.get(),
                 self.ssc_var.get(),
-                self.progress_var.set,
+                self.set_progress,
                 self.close_event,
             )
             if rip_done:
@@ -200,6 +218,11 @@ class Application(ttk.Frame):  # pylint: disable=too-many-ancestors
         """Handler for <<done_rip>> event, finishing up the ripping process"""
         self.rip_thread = None
 
+        if self.close_event.is_set():
+            # the user closed the window while ripping, see close()
+            self.master.destroy()
+            return
+
         for elem in self.interactive_elems:
             elem["state"] = "enabled"
 
@@ -209,77 +232,67 @@ class Application(ttk.Frame):  # pylint: disable=too-many-ancestors
             else:
                 messagebox.showinfo(*self.done_messagebox)
 
-    def emit_log(self, _event=None):
-        """Handler for <<emit_log>> event, emitting a single log message"""
-        # true if the widget has been scrolled up
-        keep_position = self.log.yview()[1] != 1.0
-        self.log["state"] = "normal"
-        msg = self.log_queue.get()
-        if self.log_empty:
-            self.log_empty = False
-        else:
-            msg = "\n" + msg
-        self.log.insert("end", msg)
-        self.log["state"] = "disabled"
-        if not keep_position:
-            self.log.yview_moveto(1.0)
-
-    def close(self, chained=False):
+    def flush_log(self):
+        """Periodically emit all queued log messages in one insert and show the latest progress"""
+        messages = []
+        while True:
+            try:
+                # QueueHandler has already formatted the record into its message
+                messages.append(self.log_queue.get_nowait().getMessage())
+            except queue.Empty:
+                break
+        if messages:
+            # true if the widget has been scrolled up
+            keep_position = self.log.yview()[1] != 1.0
+            self.log["state"] = "normal"
+            msg = "\n".join(messages)
+            if self.log_empty:
+                self.log_empty = False
+            else:
+                msg = "\n" + msg
+            self.log.insert("end", msg)
+            if not keep_position:
+                # only trim while following the end of the log, so scrolling back isn't disturbed
+                excess = int(self.log.index("end-1c").split(".", maxsplit=1)[0]) - LOG_MAX_LINES
+                if excess > 0:
+                    self.log.delete("1.0", f"{excess + 1}.0")
+            self.log["state"] = "disabled"
+            if not keep_position:
+                self.log.yview_moveto(1.0)
+        # compare in Python, reading progress_var back would be a round trip to Tcl
+        progress = self.progress
+        if progress != self.shown_progress:
+            self.shown_progress = progress
+            self.progress_var.set(progress)
+        self.after(FLUSH_INTERVAL, self.flush_log)
+
+    def set_progress(self, progress):
+        """Progress callback for the rip thread, this does not touch Tkinter"""
+        self.progress = progress
+
+    def close(self):
         """Hook for X button, to exit gracefully"""
-        if self.rip_thread is not None and self.rip_thread.is_alive():
-            # ripping is currently in progress
+        if self.rip_thread is not None:
+            # ripping is currently in progress, done_rip() destroys the window once it stops
             if not self.close_event.is_set():
-                # first time close() is being called
                 self.close_event.set()
                 logger.info("Cancelling...")
-                # schedule initial check
-                self.master.after(100, self.close, True)
-            if chained:
-                # chain checks
-                self.master.after(100, self.close, True)
         else:
             self.master.destroy()
 
 
-class TkinterEventHandler(logging.Handler):
-    """Log handler that emits into a scrolledtextwidget
-
-    Shoves formatted records into a queue and fire events.
-    """
-
-    def __init__(self, app: Application, record_q: queue.SimpleQueue):
-        super().__init__()
-        self.app = app
-        self.record_q = record_q
-
-    def handle(self, record: logging.LogRecord):
-        retval = super().handle(record)
-        if retval:
-            # generating an event requires some sort of lock that the main loop holds while
-            # processing events, so  we generate the event after releasing the handler's IO lock
-            # or else we will deadlock if the main thread and the rip thread both want to log
-            self.app.event_generate("<<emit_log>>")
-        return retval
-
-    def emit(self, record: logging.LogRecord) -> None:
-        try:
-            self.record_q.put(self.format(record))
-        except Exception:  # pylint: disable=broad-except
-            # catching Exception is standard in handlers' emit()
-            self.handleError(record)
-
-
 def run():
     """Main entry point of the GUI application"""
     root = tk.Tk()
     app = Application(master=root)
 
-    sthandler = TkinterEventHandler(app, app.log_queue)
+    # records are queued from any thread and emitted on the main thread by app.flush_log()
+    queue_handler = logging.handlers.QueueHandler(app.log_queue)
     formatter = logging.Formatter("%(message)s")
-    sthandler.setFormatter(formatter)
+    queue_handler.setFormatter(formatter)
     root_logger = logging.getLogger("")
     root_logger.setLevel(logging.INFO)
-    root_logger.addHandler(sthandler)
+    root_logger.addHandler(queue_handler)
 
     root.protocol("WM_DELETE_WINDOW", app.close)
     app.mainloop()